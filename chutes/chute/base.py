@@ -69,6 +69,7 @@ class Chute(FastAPI):
         self._startup_hooks = []
         self._shutdown_hooks = []
         self._cords: list[Cord] = []
+        self._cord_paths: set[str] = set()
         self.concurrency = concurrency
         self.docs_url = None
         self.redoc_url = None
@@ -173,6 +174,13 @@ class Chute(FastAPI):
         self.add_api_route("/_alive", lambda: {"alive": True}, methods=["GET"])
         logger.info("Added liveness endpoint: /_alive")
 
+    async def aclose(self):
+        """
+        Release any pooled HTTP sessions held by the cords.
+        """
+        for cord in self._cords:
+            await cord.aclose()
+
     def cord(self, **kwargs):
         """
         Decorator to define a parachute cord (function).
@@ -181,6 +189,9 @@ class Chute(FastAPI):
 
         cord = Cord(self, **kwargs)
         self._cords.append(cord)
+        if cord.path:
+            self._cord_paths.add(cord.path)
+        cord._registered = True
         return cord
 
 
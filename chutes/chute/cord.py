@@ -1,18 +1,20 @@
 import os
+import asyncio
 import aiohttp
 import re
 import backoff
-import gzip
 import time
+import zlib
 import orjson as json
 import fickling
 import pickle
 import base64
+import msgspec
 from pydantic import ValidationError
 from typing import Optional, Dict, Any
 from fastapi import Request, HTTPException, status
 from loguru import logger
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from starlette.responses import StreamingResponse
 from chutes.exception import InvalidPath, DuplicatePath, StillProvisioning
 from chutes.util.context import is_local
@@ -24,7 +26,158 @@ from chutes.chute.base import Chute
 import chutes.metrics as metrics
 
 # Simple regex to check for custom path overrides.
-PATH_RE = re.compile(r"^(/[a-z0-9]+[a-z0-9-_]*)+$")
+PATH_RE = re.compile(r"^(/[a-z0-9]+[a-z0-9-_]*)+$", re.ASCII)
+
+
+def _validate_path(path: str) -> str:
+    """
+    Normalize a URL path and check that it's valid.
+    """
+    if path.isascii() and path.isidentifier() and path.islower() and path[0] != "_":
+        # Lowercase identifiers (e.g. function names) are always valid, skip the regex.
+        return "/" + path
+    path = "/" + path.lstrip("/").rstrip("/")
+    if "//" in path or not PATH_RE.match(path):
+        raise InvalidPath(path)
+    return path
+
+
+class StreamEvent(msgspec.Struct):
+    """
+    A single "data: {...}" event from a streamed invocation response.
+    """
+
+    trace: Any = None
+    error: Any = None
+    result: Any = None
+
+
+STREAM_EVENT_DECODER = msgspec.json.Decoder(StreamEvent)
+
+# Leading (version) byte of a serialized call payload, identifying the encoding.
+PAYLOAD_MSGPACK = b"\x01"
+PAYLOAD_PICKLE = b"\x02"
+
+
+def _compress(data: bytes) -> bytes:
+    """
+    Gzip-compatible compression at the fastest level (payloads are small, so the
+    cost is CPU rather than bandwidth), without the gzip module's file wrapper.
+    """
+    compressor = zlib.compressobj(1, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(data: bytes) -> bytes:
+    """
+    Decompress a gzip payload.
+    """
+    return zlib.decompress(data, 31)
+
+
+def _is_msgpack_exact(value: Any) -> bool:
+    """
+    Check if a value survives a msgpack round trip unchanged (no tuples, sets,
+    subclasses, or other types msgpack would coerce or reject).
+    """
+    value_type = type(value)
+    if value_type is int:
+        return -(2**63) <= value < 2**64
+    if value_type in (type(None), bool, float, str, bytes):
+        return True
+    if value_type is list:
+        return all(_is_msgpack_exact(item) for item in value)
+    if value_type is dict:
+        return all(_is_msgpack_exact(k) and _is_msgpack_exact(v) for k, v in value.items())
+    return False
+
+
+def _encode_payload(args: tuple, kwargs: Dict[str, Any]) -> bytes:
+    """
+    Serialize call arguments into the JSON request body for the API.
+
+    Deployed chutes running older versions of this library only understand the legacy
+    per-field pickle payloads, so the versioned (msgpack, falling back to pickle for
+    anything msgpack can't represent exactly) payload is opt-in via the
+    CHUTES_VERSIONED_PAYLOADS=1 environment variable until servers can be detected.
+    """
+    if os.getenv("CHUTES_VERSIONED_PAYLOADS") != "1":
+        return json.dumps(
+            {
+                "args": base64.b64encode(_compress(pickle.dumps(args))).decode(),
+                "kwargs": base64.b64encode(_compress(pickle.dumps(kwargs))).decode(),
+            }
+        )
+    payload = {"args": list(args), "kwargs": kwargs}
+    if _is_msgpack_exact(payload):
+        version = PAYLOAD_MSGPACK
+        serialized = msgspec.msgpack.encode(payload)
+    else:
+        version = PAYLOAD_PICKLE
+        serialized = pickle.dumps({"args": args, "kwargs": kwargs})
+    encoded = base64.b64encode(version + _compress(serialized))
+    del serialized
+
+    # Base64 never needs JSON escaping, so build the body directly instead of
+    # round-tripping the (potentially large) encoded payload through str and orjson.
+    return b'{"payload":"' + encoded + b'"}'
+
+
+def _decode_payload(payload: Dict[str, str]):
+    """
+    Deserialize call arguments, also accepting the legacy per-field pickle payloads.
+    """
+    if "payload" not in payload:
+        args = fickling.load(_decompress(base64.b64decode(payload["args"])))
+        kwargs = fickling.load(_decompress(base64.b64decode(payload["kwargs"])))
+        return args, kwargs
+    raw = base64.b64decode(payload["payload"])
+    version, body = raw[:1], _decompress(memoryview(raw)[1:])
+    if version == PAYLOAD_MSGPACK:
+        unpacked = msgspec.msgpack.decode(body)
+    elif version == PAYLOAD_PICKLE:
+        unpacked = fickling.load(body)
+    else:
+        raise ValueError(f"Unsupported payload version: {version!r}")
+    if not isinstance(unpacked, dict):
+        raise ValueError(f"Expected an args/kwargs mapping, got {type(unpacked).__name__}")
+    return unpacked["args"], unpacked["kwargs"]
+
+
+def _format_trace(trace: Any) -> str:
+    """
+    Format a trace event from a streamed response as a log message.
+    """
+    if not isinstance(trace, dict):
+        return str(trace)
+    fields = " ".join(
+        f"{key}={value}" for key, value in trace.items() if key not in ("timestamp", "message")
+    )
+    return f"{trace['timestamp']} [{fields}]: {trace['message']}"
+
+
+async def _iter_lines(content: aiohttp.StreamReader):
+    """
+    Iterate over complete lines of a response body (without the trailing newline).
+
+    Unlike iterating the StreamReader directly, this has no maximum line length, so
+    large results in a single SSE event are not rejected.
+    """
+    pending = []
+    async for chunk in content.iter_any():
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            if pending:
+                pending.append(chunk[start:end])
+                yield b"".join(pending)
+                pending.clear()
+            else:
+                yield chunk[start:end]
+            start = end + 1
+        if start < len(chunk):
+            pending.append(chunk[start:])
+    if pending:
+        yield b"".join(pending)
 
 
 class Cord:
@@ -50,6 +203,7 @@ class Cord:
         Constructor.
         """
         self._app = app
+        self._registered = False
         self._path = None
         if path:
             self.path = path
@@ -66,7 +220,17 @@ class Cord:
         self._method = method
         self._session_kwargs = session_kwargs
         self._provision_timeout = provision_timeout
+        self._post_with_retry = backoff.on_exception(
+            backoff.constant,
+            (StillProvisioning,),
+            jitter=None,
+            interval=1,
+            max_time=provision_timeout,
+        )(self._post)
         self._config = None
+        self._session = None
+        self._session_key = None
+        self._passthrough_session = None
         self.input_models = (
             [input_schema] if input_schema and hasattr(input_schema, "__fields__") else None
         )
@@ -107,11 +271,13 @@ class Cord:
         :type path: str
 
         """
-        path = "/" + path.lstrip("/").rstrip("/")
-        if "//" in path or not PATH_RE.match(path):
-            raise InvalidPath(path)
-        if any([cord.path == path for cord in self._app.cords]):
+        path = _validate_path(path)
+        if path in self._app._cord_paths:
             raise DuplicatePath(path)
+        # Only cords that made it into the chute hold a path; see Chute.cord().
+        if self._registered:
+            self._app._cord_paths.discard(self._path)
+            self._app._cord_paths.add(path)
         self._path = path
 
     @property
@@ -130,9 +296,7 @@ class Cord:
         :type path: str
 
         """
-        path = "/" + path.lstrip("/").rstrip("/")
-        if "//" in path or not PATH_RE.match(path):
-            raise InvalidPath(path)
+        path = _validate_path(path)
         self._passthrough_path = path
 
     @property
@@ -151,11 +315,86 @@ class Cord:
         :type path: str
 
         """
-        path = "/" + path.lstrip("/").rstrip("/")
-        if "//" in path or not PATH_RE.match(path):
-            raise InvalidPath(path)
+        path = _validate_path(path)
         self._public_api_path = path
 
+    async def _get_session(self, base_url: str) -> aiohttp.ClientSession:
+        """
+        Lazily create (or re-create) the pooled client session used to invoke the API,
+        so repeated calls can re-use keepalive connections.
+        """
+        # Sessions are bound to the event loop they were created in, and clients
+        # commonly call asyncio.run(...) more than once.
+        session_key = (base_url, asyncio.get_running_loop())
+        if self._session is None or self._session.closed or self._session_key != session_key:
+            if self._session is not None and not self._session.closed:
+                # The previous loop may already be closed, so this is best effort.
+                with suppress(Exception):
+                    await self._session.close()
+            session_kwargs = dict(self._session_kwargs)
+            if "connector" not in session_kwargs:
+                # No connection cap: each call (e.g. a long-lived stream) holds its
+                # connection, and queueing for a pooled one would eat into the timeout.
+                session_kwargs["connector"] = aiohttp.TCPConnector(
+                    limit=0, keepalive_timeout=75, ttl_dns_cache=300
+                )
+            self._session = aiohttp.ClientSession(base_url=base_url, **session_kwargs)
+            self._session_key = session_key
+        return self._session
+
+    async def _get_passthrough_session(self) -> aiohttp.ClientSession:
+        """
+        Lazily create the pooled client session used for passthrough calls.
+        """
+        if self._passthrough_session is None or self._passthrough_session.closed:
+            self._passthrough_session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(connect=5.0, total=600.0),
+                read_bufsize=8 * 1024 * 1024,
+                base_url=f"http://127.0.0.1:{self._passthrough_port or 8000}",
+                connector=aiohttp.TCPConnector(limit=0, keepalive_timeout=75),
+            )
+        return self._passthrough_session
+
+    async def aclose(self):
+        """
+        Close any pooled client sessions.
+        """
+        for attr in ("_session", "_passthrough_session"):
+            session = getattr(self, attr)
+            setattr(self, attr, None)
+            if session is not None and not session.closed:
+                await session.close()
+
+    async def _post(self, request_body: bytes) -> aiohttp.ClientResponse:
+        """
+        Send a single (signed) invocation request to the API.
+        """
+        dev_url = os.getenv("CHUTES_DEV_URL")
+        headers = {}
+        if not dev_url:
+            headers, _ = sign_request(payload=request_body)
+        headers["Content-Type"] = "application/json"
+        headers.update(self._static_headers)
+        base_url = dev_url or self.config.generic.api_base_url
+        path = f"/chutes/{self._app.uid}{self.path}" if not dev_url else self.path
+        session = await self._get_session(base_url)
+        response = await session.post(
+            path,
+            data=request_body,
+            headers=headers,
+        )
+        if response.status == 503:
+            async with response:
+                logger.warning(f"Function {self._func.__name__} is still provisioning...")
+                raise StillProvisioning(await response.text())
+        elif response.status != 200:
+            async with response:
+                logger.error(
+                    f"Error invoking {self._func.__name__} [status={response.status}]: {await response.text()}"
+                )
+                raise Exception(await response.text())
+        return response
+
     @asynccontextmanager
     async def _local_call_base(self, *args, **kwargs):
         """
@@ -163,52 +402,9 @@ class Cord:
         we're actually just calling the chutes API.
         """
         logger.debug(f"Invoking remote function {self._func.__name__} via HTTP...")
-
-        @backoff.on_exception(
-            backoff.constant,
-            (StillProvisioning,),
-            jitter=None,
-            interval=1,
-            max_time=self._provision_timeout,
-        )
-        @asynccontextmanager
-        async def _call():
-            request_payload = {
-                "args": base64.b64encode(gzip.compress(pickle.dumps(args))).decode(),
-                "kwargs": base64.b64encode(gzip.compress(pickle.dumps(kwargs))).decode(),
-            }
-            dev_url = os.getenv("CHUTES_DEV_URL")
-            headers, payload_string = {}, None
-            if dev_url:
-                payload_string = json.dumps(request_payload)
-            else:
-                headers, payload_string = sign_request(payload=request_payload)
-            headers.update(
-                {
-                    CHUTEID_HEADER: self._app.uid,
-                    FUNCTION_HEADER: self._func.__name__,
-                }
-            )
-            base_url = dev_url or self.config.generic.api_base_url
-            path = f"/chutes/{self._app.uid}{self.path}" if not dev_url else self.path
-            async with aiohttp.ClientSession(base_url=base_url, **self._session_kwargs) as session:
-                async with session.post(
-                    path,
-                    data=payload_string,
-                    headers=headers,
-                ) as response:
-                    if response.status == 503:
-                        logger.warning(f"Function {self._func.__name__} is still provisioning...")
-                        raise StillProvisioning(await response.text())
-                    elif response.status != 200:
-                        logger.error(
-                            f"Error invoking {self._func.__name__} [status={response.status}]: {await response.text()}"
-                        )
-                        raise Exception(await response.text())
-                    yield response
-
+        request_body = _encode_payload(args, kwargs)
         started_at = time.time()
-        async with _call() as response:
+        async with await self._post_with_retry(request_body) as response:
             yield response
         logger.debug(
             f"Completed remote invocation [{self._func.__name__} passthrough={self._passthrough}] in {time.time() - started_at} seconds"
@@ -226,6 +422,23 @@ class Cord:
             result = item
         return result
 
+    async def _stream_results(self, response: aiohttp.ClientResponse):
+        """
+        Iterate over the results in a streaming API response, logging traces and
+        raising on errors.
+        """
+        async for line in _iter_lines(response.content):
+            if not line.startswith(b"data: {"):
+                continue
+            event = STREAM_EVENT_DECODER.decode(memoryview(line)[6:])
+            if event.trace:
+                logger.opt(lazy=True).debug("{}", lambda: _format_trace(event.trace))
+            elif event.error:
+                logger.error(event.error)
+                raise Exception(event.error)
+            elif event.result:
+                yield event.result
+
     async def _local_stream_call(self, *args, **kwargs):
         """
         Call the function from the local context, i.e. make an API request, but
@@ -233,39 +446,34 @@ class Cord:
         response.
         """
         async with self._local_call_base(*args, **kwargs) as response:
-            async for encoded_content in response.content:
-                if (
-                    not encoded_content
-                    or not encoded_content.strip()
-                    or not encoded_content.startswith(b"data: {")
-                ):
-                    continue
-                content = encoded_content.decode()
-                data = json.loads(content[6:])
-                if data.get("trace"):
-                    message = "".join(
-                        [
-                            data["trace"]["timestamp"],
-                            " ["
-                            + " ".join(
-                                [
-                                    f"{key}={value}"
-                                    for key, value in data["trace"].items()
-                                    if key not in ("timestamp", "message")
-                                ]
-                            ),
-                            f"]: {data['trace']['message']}",
-                        ]
-                    )
-                    logger.debug(message)
-                elif data.get("error"):
-                    logger.error(data["error"])
-                    raise Exception(data["error"])
-                elif data.get("result"):
-                    if self._passthrough:
-                        yield await self._func(data["result"])
-                    else:
-                        yield data["result"]
+            if not self._passthrough:
+                async for result in self._stream_results(response):
+                    yield result
+                return
+
+            # Keep reading from the network while the passthrough function processes
+            # the previous result, with a bounded queue for backpressure.
+            queue = asyncio.Queue(maxsize=16)
+
+            async def _produce():
+                try:
+                    async for result in self._stream_results(response):
+                        await queue.put((result, None))
+                    await queue.put(None)
+                except Exception as exc:
+                    await queue.put((None, exc))
+
+            producer = asyncio.create_task(_produce())
+            try:
+                while (item := await queue.get()) is not None:
+                    result, exc = item
+                    if exc:
+                        raise exc
+                    yield await self._func(result)
+            finally:
+                producer.cancel()
+                with suppress(asyncio.CancelledError):
+                    await producer
 
     @asynccontextmanager
     async def _passthrough_call(self, **kwargs):
@@ -275,15 +483,11 @@ class Cord:
         logger.debug(
             f"Received passthrough call, passing along to {self.passthrough_path} via {self._method}"
         )
-        async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(connect=5.0, total=600.0),
-            read_bufsize=8 * 1024 * 1024,
-            base_url=f"http://127.0.0.1:{self._passthrough_port or 8000}",
-        ) as session:
-            async with getattr(session, self._method.lower())(
-                self.passthrough_path, **kwargs
-            ) as response:
-                yield response
+        session = await self._get_passthrough_session()
+        async with getattr(session, self._method.lower())(
+            self.passthrough_path, **kwargs
+        ) as response:
+            yield response
 
     async def _remote_call(self, request: Request, *args, **kwargs):
         """
@@ -403,19 +607,20 @@ class Cord:
         args, kwargs = None, None
         if request.state.serialized:
             try:
-                args = fickling.load(
-                    gzip.decompress(base64.b64decode(request.state.decrypted["args"]))
-                )
-                kwargs = fickling.load(
-                    gzip.decompress(base64.b64decode(request.state.decrypted["kwargs"]))
-                )
+                args, kwargs = _decode_payload(request.state.decrypted)
             except fickling.exception.UnsafeFileError as exc:
                 message = f"Detected potentially hazardous call arguments, blocking: {exc}"
                 logger.error(message)
                 raise HTTPException(
-                    status_code=status.HTTP_401_FORBIDDEN,
+                    status_code=status.HTTP_403_FORBIDDEN,
                     detail=message,
                 )
+            except (ValueError, KeyError, TypeError, zlib.error, msgspec.DecodeError) as exc:
+                logger.error(f"Invalid call payload: {exc}")
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid call payload",
+                )
         else:
             # Dev mode hacks.
             if not self._passthrough:
@@ -441,6 +646,10 @@ class Cord:
 
     def __call__(self, func):
         self._func = func
+        self._static_headers = {
+            CHUTEID_HEADER: self._app.uid,
+            FUNCTION_HEADER: func.__name__,
+        }
         if not self._path:
             self.path = func.__name__
         if not self._passthrough_path:
@@ -3,14 +3,13 @@ import aiohttp
 import re
 import os
 import sys
-import shutil
 import importlib
 import tempfile
+import zipfile
 import base64
 import pickle
 import orjson as json
 from io import BytesIO
-from contextlib import contextmanager
 from loguru import logger
 import typer
 
@@ -21,17 +20,17 @@ from chutes.image.directive.generic_run import RUN
 from chutes.entrypoint._shared import load_chute, FakeStreamWriter, upload_logo
 from chutes.util.auth import sign_request
 
+# Imported files that should never be added to the build context.
+EXCLUDED_FILES_RE = re.compile(r"(?:site|dist)-packages|bin/chutes|^\.local")
 
-@contextmanager
-def temporary_build_directory(image):
+
+def _confirm_build_context(image):
     """
-    Helper to copy the build context files to a build directory.
+    Collect the build context files from the image directives and confirm them with the user.
     """
-
-    # Confirm the context files with the user.
-    all_input_files = []
-    for directive in image._directives:
-        all_input_files += directive._build_context
+    all_input_files = list(
+        dict.fromkeys(path for directive in image._directives for path in directive._build_context)
+    )
 
     samples = all_input_files[:10]
     logger.info(
@@ -44,30 +43,47 @@ def temporary_build_directory(image):
             f"\033[93mShowing {len(samples)} of {len(all_input_files)}, would you like to see the rest? (y/n) \033[0m"
         )
         if show_all.lower() == "y":
-            for path in all_input_files[:10]:
+            for path in all_input_files[len(samples) :]:
                 logger.info(f" {path}")
     confirm = input("\033[1m\033[4mConfirm submitting build context? (y/n) \033[0m")
     if confirm.lower().strip() != "y":
         logger.error("Aborting!")
         sys.exit(1)
+    return all_input_files
 
-    # Copy all of the context files over to a temp dir (to use for local building or a zip file for remote).
-    _clean_path = lambda in_: in_[len(os.getcwd()) + 1 :]  # noqa: E731
-    with tempfile.TemporaryDirectory() as tempdir:
-        for path in all_input_files:
-            temp_path = os.path.join(tempdir, _clean_path(os.path.abspath(path)))
-            os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-            logger.debug(f"Copying {path} to {temp_path}")
-            shutil.copy(path, temp_path)
-        yield tempdir
+
+def _context_paths(paths):
+    """
+    Pair each build context file with its path relative to the current directory.
+    """
+    # Resolve against a single getcwd() rather than os.path.abspath per file.
+    cwd = os.getcwd()
+    prefix_len = len(cwd) + 1
+    return [(path, os.path.normpath(os.path.join(cwd, path))[prefix_len:]) for path in paths]
 
 
-def _build_local(image):
+def _build_context_archive(image) -> BytesIO:
+    """
+    Zip up the build context files (for remote builds) straight from their source
+    paths, rather than staging a copy in a temp dir and archiving that.
+    """
+    all_input_files = _confirm_build_context(image)
+    arcnames = {arcname: path for path, arcname in _context_paths(all_input_files)}
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for arcname, path in arcnames.items():
+            logger.debug(f"Adding {path} to build context as {arcname}")
+            zf.write(path, arcname=arcname)
+    archive.seek(0)
+    return archive
+
+
+def _build_local(image, dockerfile: str):
     """
     Build an image locally, directly with docker (for testing purposes).
     """
     with tempfile.NamedTemporaryFile() as tmp:
-        tmp.write(str(image).encode())
+        tmp.write(dockerfile.encode())
         tmp.flush()
         tmp.seek(0)
         logger.info(f"Starting build of {tmp.name}...")
@@ -77,92 +93,77 @@ def _build_local(image):
         )
 
 
-async def _build_remote(image, wait=None, public: bool = False, logo_id: str = None):
+async def _build_remote(
+    image, dockerfile: str, wait=None, public: bool = False, logo_id: str = None
+):
     """
     Build an image remotely, that is, package up the build context and ship it
     off to the chutes API to have it built.
     """
     config = get_config()
-    with temporary_build_directory(image) as build_directory:
-        temp_zip = None
-        try:
-            with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as tf:
-                temp_zip = tf.name
-            logger.info(f"Packaging up the build directory to upload: {build_directory}")
-            output_path = shutil.make_archive(temp_zip[:-4], "zip", build_directory)
-            final_path = os.path.join(build_directory, "chute.zip")
-            shutil.move(output_path, final_path)
-        finally:
-            if os.path.exists(temp_zip):
-                os.remove(temp_zip)
-
-        logger.info(f"Created the build package: {output_path}, uploading...")
-        form_data = aiohttp.FormData()
-        form_data.add_field("username", image.username)
-        form_data.add_field("name", image.name)
-        form_data.add_field("tag", image.tag)
-        form_data.add_field("readme", image.readme or "")
-        form_data.add_field("dockerfile", str(image))
-        form_data.add_field("public", str(public))
-        form_data.add_field("logo_id", str(logo_id) if logo_id else "__none__")
-        form_data.add_field("wait", str(wait))
-        form_data.add_field("image", base64.b64encode(pickle.dumps(image)).decode())
-        with open(os.path.join(build_directory, "chute.zip"), "rb") as infile:
-            form_data.add_field(
-                "build_context",
-                BytesIO(infile.read()),
-                filename="chute.zip",
-                content_type="application/zip",
-            )
+    logger.info("Packaging up the build context to upload...")
+    build_context = _build_context_archive(image)
+    logger.info(
+        f"Created the build package ({build_context.getbuffer().nbytes} bytes), uploading..."
+    )
+    form_data = aiohttp.FormData()
+    form_data.add_field("username", image.username)
+    form_data.add_field("name", image.name)
+    form_data.add_field("tag", image.tag)
+    form_data.add_field("readme", image.readme or "")
+    form_data.add_field("dockerfile", dockerfile)
+    form_data.add_field("public", str(public))
+    form_data.add_field("logo_id", str(logo_id) if logo_id else "__none__")
+    form_data.add_field("wait", str(wait))
+    form_data.add_field("image", base64.b64encode(pickle.dumps(image)).decode())
+    form_data.add_field(
+        "build_context",
+        build_context,
+        filename="chute.zip",
+        content_type="application/zip",
+    )
 
-        # Get the payload and write it to the custom writer
-        payload = form_data()
-        writer = FakeStreamWriter()
-        await payload.write(writer)
+    # Get the payload and write it to the custom writer
+    payload = form_data()
+    writer = FakeStreamWriter()
+    await payload.write(writer)
 
-        # Retrieve the raw bytes of the request body
-        raw_data = writer.output.getvalue()
+    # Retrieve the raw bytes of the request body
+    raw_data = writer.output.getvalue()
 
-        async with aiohttp.ClientSession(base_url=config.generic.api_base_url) as session:
-            headers, payload_string = sign_request(payload=raw_data)
-            headers["Content-Type"] = payload.content_type
-            headers["Content-Length"] = str(len(raw_data))
-            async with session.post(
-                "/images/",
-                data=raw_data,
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=None),
-            ) as response:
-                # When the client waits for the image, we just stream the logs.
-                if wait:
-                    async for data_enc in response.content:
-                        data = data_enc.decode()
-                        if not data or not data.strip():
-                            continue
-                        if data.startswith("data: {"):
-                            data = json.loads(data[6:])
-                            log_method = (
-                                logger.info if data["log_type"] == "stdout" else logger.warning
-                            )
-                            log_method(data["log"].strip())
-                        elif data.startswith("DONE"):
-                            break
-                        else:
-                            logger.error(data)
-                    return
-                if response.status == 409:
-                    logger.error(
-                        f"Image with name={image.name} and tag={image.tag} already exists!"
-                    )
-                elif response.status == 401:
-                    logger.error("Authorization error, please check your credentials.")
-                elif response.status != 202:
-                    logger.error(f"Unexpected error uploading image data: {await response.text()}")
-                else:
-                    data = await response.json()
-                    logger.info(
-                        f"Uploaded image package: image_id={data['image_id']}, build will run async"
-                    )
+    async with aiohttp.ClientSession(base_url=config.generic.api_base_url) as session:
+        headers, payload_string = sign_request(payload=raw_data)
+        headers["Content-Type"] = payload.content_type
+        headers["Content-Length"] = str(len(raw_data))
+        async with session.post(
+            "/images/",
+            data=raw_data,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=None),
+        ) as response:
+            # When the client waits for the image, we just stream the logs.
+            if wait:
+                async for data in response.content:
+                    if data.startswith(b"data: {"):
+                        data = json.loads(data[6:])
+                        log_method = logger.info if data["log_type"] == "stdout" else logger.warning
+                        log_method(data["log"].strip())
+                    elif data.startswith(b"DONE"):
+                        break
+                    elif data.strip():
+                        logger.error(data.decode())
+                return
+            if response.status == 409:
+                logger.error(f"Image with name={image.name} and tag={image.tag} already exists!")
+            elif response.status == 401:
+                logger.error("Authorization error, please check your credentials.")
+            elif response.status != 202:
+                logger.error(f"Unexpected error uploading image data: {await response.text()}")
+            else:
+                data = await response.json()
+                logger.info(
+                    f"Uploaded image package: image_id={data['image_id']}, build will run async"
+                )
 
 
 async def _image_exists(image: str | Image) -> bool:
@@ -252,24 +253,25 @@ def build_image(
                     f"You must run the build command from the directory containing your target chute module: {module.__file__} [{current_directory=}]"
                 )
                 sys.exit(1)
-            _clean_path = lambda in_: in_[len(current_directory) + 1 :]  # noqa: E731
+            prefix_len = len(current_directory) + 1
+            _clean_path = lambda in_: in_[prefix_len:]  # noqa: E731
             image._directives.append(
                 ADD(
                     source=_clean_path(module.__file__),
                     dest=f"/app/{_clean_path(module.__file__)}",
                 )
             )
-            imported_files = [
-                os.path.abspath(module.__file__)
-                for module in sys.modules.values()
-                if hasattr(module, "__file__") and module.__file__
-            ]
+            # Modules are loaded from absolute sys.path entries, so __file__ is already absolute.
+            imported_files = dict.fromkeys(
+                getattr(module, "__file__", None) for module in list(sys.modules.values())
+            )
             imported_files = [
                 f
                 for f in imported_files
-                if f.startswith(current_directory)
-                and not re.search(r"(site|dist)-packages|bin/chutes|^\.local", f)
-                and f != os.path.abspath(module.__file__)
+                if f
+                and f.startswith(current_directory)
+                and not EXCLUDED_FILES_RE.search(f)
+                and f != module_path
             ]
             for path in imported_files:
                 image._directives.append(
@@ -278,13 +280,14 @@ def build_image(
                         dest=f"/app/{_clean_path(path)}",
                     )
                 )
-        logger.debug(f"Generated Dockerfile:\n{str(image)}")
+        dockerfile = str(image)
+        logger.debug(f"Generated Dockerfile:\n{dockerfile}")
 
         # Building locally?
         if local:
-            return _build_local(image)
+            return _build_local(image, dockerfile)
 
         # Package up the context and ship it off for building.
-        return await _build_remote(image, wait=wait, public=public, logo_id=logo_id)
+        return await _build_remote(image, dockerfile, wait=wait, public=public, logo_id=logo_id)
 
     return asyncio.run(_build_image())
@@ -110,7 +110,9 @@ class DevMiddleware(BaseHTTPMiddleware):
         """
         Dev/dummy dispatch.
         """
-        args = await request.json() if request.method in ("POST", "PUT", "PATCH") else None
+        args = (
+            json.loads(await request.body()) if request.method in ("POST", "PUT", "PATCH") else None
+        )
         request.state.serialized = False
         request.state.decrypted = args
         return await call_next(request)
@@ -489,6 +491,9 @@ def run_chute(
 
         config = Config(app=chute, host=host, port=port, limit_concurrency=1000)
         server = Server(config)
-        await server.serve()
+        try:
+            await server.serve()
+        finally:
+            await chute.aclose()
 
     asyncio.run(_run_chute())
@@ -93,18 +93,32 @@ class ADD(BaseDirective):
             negative_patterns = set([])
             for pattern in exclude or []:
                 for path in glob.glob(pattern, recursive=True):
-                    negative_patterns.add(path)
+                    negative_patterns.add(os.path.normpath(path))
             if not build_dir:
                 build_dir = os.getcwd()
 
             # Update the build context here, since we actually remotely sync the
             # build context and only want to include files that will actually be
-            # included in the docker image.
-            self._build_context = [
-                path
-                for path in positive_patterns
-                if path not in negative_patterns and os.path.abspath(path).startswith(build_dir)
-            ]
+            # included in the docker image.  Directories are expanded to the files
+            # they contain, so the exclusions also apply within them.
+            build_context = {}
+            for path in map(os.path.normpath, positive_patterns):
+                if path in negative_patterns or not os.path.abspath(path).startswith(build_dir):
+                    continue
+                if not os.path.isdir(path):
+                    build_context[path] = None
+                    continue
+                for root, dirnames, filenames in os.walk(path):
+                    dirnames[:] = [
+                        dirname
+                        for dirname in dirnames
+                        if os.path.normpath(os.path.join(root, dirname)) not in negative_patterns
+                    ]
+                    for filename in filenames:
+                        file_path = os.path.normpath(os.path.join(root, filename))
+                        if file_path not in negative_patterns:
+                            build_context[file_path] = None
+            self._build_context = list(build_context)
             assert (
                 self._build_context
             ), f"No (accessible) source paths matched provided pattern '{positive_patterns}'"
@@ -24,6 +24,7 @@ setup(
         "uvicorn>=0.32.0",
         "pydantic>=2.9,<3",
         "orjson>=3.10",
+        "msgspec>=0.18",
         "fickling==0.1.3",
         "setuptools>=0.75",
         "substrate-interface>=1.7.11",